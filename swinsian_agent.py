@@ -6,45 +6,195 @@ Generates playlists in Swinsian based on natural language prompts using Claude.
 Usage:
     python swinsian_agent.py "build me a playlist of 100 songs that rock and surprise"
     python swinsian_agent.py  # interactive mode
+    python swinsian_agent.py --refresh "..."  # re-read the library instead of using the cache
 """
 
+import asyncio
+import functools
+import hashlib
+import heapq
+import contextlib
+import csv
+import io
 import subprocess
 import json
+import os
 import sys
 import re
 import math
 import random
+import tempfile
+import time
+from dataclasses import dataclass, field, fields
 import anthropic
+import orjson
 
 # ── Config ────────────────────────────────────────────────────────────────────
 MAX_TRACKS_FULL    = 1500   # send full metadata up to this size
 MAX_TRACKS_COMPACT = 4000   # send compact catalog (id|title|artist) up to this size
 CLAUDE_MODEL       = "claude-haiku-4-5-20251001"
+# Each tool keeps its own cache file, so a CACHE_VERSION or Library change in one
+# never makes the other treat the cache as invalid and rewrite it on every run
+CACHE_PATH         = os.path.expanduser("~/.cache/swinsian_agent/cli_library.json")
+CACHE_VERSION      = 3
+CACHE_MAX_AGE      = 24 * 60 * 60  # seconds before cached ratings/play counts are re-read
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Markdown fences and the JSON object in Claude's reply
+_FENCE_OPEN  = re.compile(r'^```[a-z]*\n?')
+_FENCE_CLOSE = re.compile(r'\n?```$')
+_JSON_OBJ    = re.compile(r'\{.*\}', re.DOTALL)
+_PROMPT_WORD = re.compile(r'\w+')
+
+
+@dataclass
+class Library:
+    """Track metadata stored column-wise; a track's id is its row index."""
+    titles:  list[str] = field(default_factory=list)
+    artists: list[str] = field(default_factory=list)
+    albums:  list[str] = field(default_factory=list)
+    genres:  list[str] = field(default_factory=list)
+    years:   list[str] = field(default_factory=list)
+    ratings: list[str] = field(default_factory=list)
+    plays:   list[str] = field(default_factory=list)
+    pids:    list[str] = field(default_factory=list)
+    # "★3" / "▶12" catalog labels, built once per library rather than per catalog line
+    rating_labels: list[str] = field(init=False, repr=False)
+    play_labels:   list[str] = field(init=False, repr=False)
+    # lowercased "title artist album genre" text matched by prefilter()
+    search_blobs:  list[str] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.rating_labels = ["★" + r for r in self.ratings]
+        self.play_labels   = ["▶" + p for p in self.plays]
+        self.search_blobs  = [
+            f"{t} {a} {al} {g}".lower()
+            for t, a, al, g in zip(self.titles, self.artists, self.albums, self.genres)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+
+async def run_osascript_async(*args: str, script: str | None = None, strip: bool = True) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate(script.encode() if script is not None else None)
+    if proc.returncode != 0:
+        raise RuntimeError(f"AppleScript error: {stderr.decode().strip()}")
+    out = stdout.decode()
+    return out.strip() if strip else out
+
+
+async def run_applescript_async(script: str, strip: bool = True) -> str:
+    # The script goes in on stdin rather than as an -e argument, so its size isn't capped by ARG_MAX
+    return await run_osascript_async("osascript", "-", script=script, strip=strip)
 
-def run_applescript(script: str) -> str:
-    result = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"AppleScript error: {result.stderr.strip()}")
-    return result.stdout.strip()
+
+# Takes the playlist name followed by persistent IDs as arguments. The `whose`
+# query returns tracks in library order, so they are put back into argument
+# order before adding. Script properties make the list lookups fast.
+ADD_TRACKS_SCRIPT = '''property found : {}
+property foundIds : {}
+
+on run argv
+    set wanted to items 2 thru -1 of argv
+    tell application "Swinsian"
+        set my found to every track whose persistent ID is in wanted
+        set my foundIds to persistent ID of every track whose persistent ID is in wanted
+    end tell
+    set ordered to {}
+    repeat with wantedRef in wanted
+        set pid to contents of wantedRef
+        repeat with k from 1 to count of my foundIds
+            if item k of my foundIds is pid then
+                set end of ordered to item k of my found
+                exit repeat
+            end if
+        end repeat
+    end repeat
+    set my found to {}
+    set my foundIds to {}
+    tell application "Swinsian" to add tracks ordered to normal playlist (item 1 of argv)
+end run'''
+
+
+async def compile_add_script() -> str:
+    """Compile ADD_TRACKS_SCRIPT once (per script version) and return the .scpt path."""
+    digest = hashlib.sha1(ADD_TRACKS_SCRIPT.encode()).hexdigest()[:8]
+    path   = os.path.join(tempfile.gettempdir(), f"swinsian_add_{digest}.scpt")
+    if not os.path.exists(path):
+        # Compile beside the final path and swap it in, so a failed or killed
+        # osacompile never leaves a truncated .scpt that later runs would reuse
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".scpt")
+        os.close(fd)
+        try:
+            await run_osascript_async("osacompile", "-o", tmp_path, "-e", ADD_TRACKS_SCRIPT)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+    return path
 
 
 def is_swinsian_running() -> bool:
+    # pgrep is a plain fork/exec, far cheaper than asking System Events via osascript
     try:
-        out = run_applescript(
-            'tell application "System Events" to return (name of processes) contains "Swinsian"'
-        )
-        return out.strip().lower() == "true"
+        return subprocess.run(["pgrep", "-x", "Swinsian"], capture_output=True).returncode == 0
     except Exception:
         return False
 
 
-def get_library_tracks() -> list[dict]:
-    """Fetch all tracks from Swinsian using fast bulk property fetching."""
+def load_cached_tracks(probe: str) -> Library | None:
+    """Return the cached library if it matches the library probe and hasn't expired."""
+    try:
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("version") != CACHE_VERSION or cached.get("probe") != probe:
+        return None
+    if time.time() - cached.get("saved_at", 0) > CACHE_MAX_AGE:
+        return None
+    return Library(**cached["library"])
+
+
+def save_cached_tracks(library: Library, probe: str):
+    """Write the library cache atomically so a crash never leaves a torn file."""
+    cache_dir = os.path.dirname(CACHE_PATH)
+    columns   = {f.name: getattr(library, f.name) for f in fields(Library) if f.init}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError:
+        return  # the cache is only an optimisation
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "probe": probe, "saved_at": time.time(), "library": columns}, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        # Don't leave a partial .tmp behind for every failed write (e.g. a full disk)
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+
+
+async def get_library_tracks(refresh: bool = False) -> Library:
+    """Fetch all tracks from Swinsian with a single bulk AppleScript call."""
     print("📚 Reading your Swinsian library…", flush=True)
 
-    def fetch_property(prop: str) -> list[str]:
+    props = [
+        ("names", "name"), ("artists", "artist"), ("albums", "album"),
+        ("genres", "genre"), ("years", "year"), ("ratings", "rating"),
+        ("play counts", "play count"), ("persistent IDs", "persistent ID"),
+    ]
+
+    def split_column(raw: str) -> list[str]:
+        return [s.strip() for s in raw.split("~~~")] if raw else []
+
+    async def fetch_property(label: str, prop: str) -> list[str]:
         script = f'''
 tell application "Swinsian"
     set vals to {prop} of every track
@@ -54,72 +204,124 @@ tell application "Swinsian"
     return output
 end tell
 '''
-        raw = run_applescript(script)
-        return raw.split("~~~") if raw else []
-
-    print("   Fetching names…",       flush=True)
-    names   = fetch_property("name")
-    print("   Fetching artists…",     flush=True)
-    artists = fetch_property("artist")
-    print("   Fetching albums…",      flush=True)
-    albums  = fetch_property("album")
-    print("   Fetching genres…",      flush=True)
-    genres  = fetch_property("genre")
-    print("   Fetching years…",       flush=True)
-    years   = fetch_property("year")
-    print("   Fetching ratings…",     flush=True)
-    ratings = fetch_property("rating")
-    print("   Fetching play counts…", flush=True)
-    plays   = fetch_property("play count")
-
-    tracks = []
-    for i, name in enumerate(names):
-        name = name.strip()
-        if not name:
-            continue
-        tracks.append({
-            "id":     i,
-            "title":  name,
-            "artist": artists[i].strip() if i < len(artists) else "",
-            "album":  albums[i].strip()  if i < len(albums)  else "",
-            "genre":  genres[i].strip()  if i < len(genres)  else "",
-            "year":   years[i].strip()   if i < len(years)   else "",
-            "rating": ratings[i].strip() if i < len(ratings) else "",
-            "plays":  plays[i].strip()   if i < len(plays)   else "",
-        })
-    return tracks
-
-
-def build_full_catalog(tracks: list[dict]) -> str:
-    lines = [f'{t["id"]}|{t["title"]}|{t["artist"]}|{t["album"]}|{t["genre"]}|{t["year"]}|★{t["rating"]}|▶{t["plays"]}' for t in tracks]
-    return "\n".join(lines)
-
-
-def build_compact_catalog(tracks: list[dict]) -> str:
-    lines = [f'{t["id"]}|{t["title"]}|{t["artist"]}' for t in tracks]
-    return "\n".join(lines)
-
-
-def ask_claude_for_playlist(prompt: str, tracks: list[dict]) -> tuple[str, list[int], str]:
-    client = anthropic.Anthropic()
-    total  = len(tracks)
+        raw = await run_applescript_async(script)
+        print(f"   Fetched {label}…", flush=True)
+        return split_column(raw)
+
+    async def fetch_all_properties(track_count: int) -> tuple[list[str], ...]:
+        # One Apple-event round-trip for every column: each property list is
+        # joined with tabs, one column per line, so csv.reader splits it all in C.
+        fetches = "\n".join(f"    set col{i} to {prop} of every track" for i, (_, prop) in enumerate(props))
+        joined  = " & linefeed & ".join(f"(col{i} as string)" for i in range(len(props)))
+        script = f'''
+tell application "Swinsian"
+{fetches}
+end tell
+set AppleScript's text item delimiters to tab
+set output to {joined}
+set AppleScript's text item delimiters to ""
+return output
+'''
+        # Not stripped: a leading tab is an empty first name, not whitespace
+        raw     = await run_applescript_async(script, strip=False)
+        try:
+            columns = list(csv.reader(io.StringIO(raw), delimiter="\t", quoting=csv.QUOTE_NONE))
+        except csv.Error as e:
+            raise RuntimeError(f"unreadable track metadata: {e}") from e
+        if track_count == 1:
+            # a one-track column with an empty value comes back as a blank line
+            columns = [col or [""] for col in columns]
+        # Tabs or line breaks inside a value shift the columns out of line
+        if len(columns) != len(props) or any(len(col) != track_count for col in columns):
+            raise RuntimeError("track metadata contains tabs or line breaks")
+        return tuple([s.strip() for s in col] for col in columns)
+
+    # The track count and the newest track's persistent ID are two cheap Apple
+    # events; if neither has changed since the last run (and the cache hasn't
+    # expired), reuse the cached metadata instead of a full fetch.
+    probe = await run_applescript_async('''
+tell application "Swinsian"
+    set n to count of every track
+    if n is 0 then return "0"
+    return (n as string) & tab & (persistent ID of last track)
+end tell''')
+    track_count = int(probe.split("\t")[0] or 0)
+    cached = None if refresh else load_cached_tracks(probe)
+    if cached is not None:
+        print("   Library unchanged, using cached metadata…", flush=True)
+        return cached
+
+    print("   Fetching track metadata…", flush=True)
+    try:
+        names, artists, albums, genres, years, ratings, plays, pids = await fetch_all_properties(track_count)
+    except RuntimeError as e:
+        print(f"   Bulk fetch failed ({e}), fetching properties separately…", flush=True)
+        # The per-property scripts run concurrently, so the wall time is the
+        # slowest fetch rather than the sum of them all.
+        names, artists, albums, genres, years, ratings, plays, pids = await asyncio.gather(
+            *(fetch_property(label, prop) for label, prop in props)
+        )
+
+    # Pad short columns once up front so building rows needs no bounds checks
+    columns = [names, artists, albums, genres, years, ratings, plays, pids]
+    for values in columns[1:]:
+        values += [""] * (len(names) - len(values))
+
+    # Tracks without a name are dropped, so ids are dense row indices
+    rows    = [i for i, name in enumerate(names) if name]
+    library = Library(*([values[i] for i in rows] for values in columns))
+    save_cached_tracks(library, probe)
+    return library
+
+
+def build_full_catalog(lib: Library) -> str:
+    # "|".join over zipped columns keeps the per-row formatting in C
+    return "\n".join(map("|".join, zip(
+        map(str, range(len(lib))), lib.titles, lib.artists, lib.albums,
+        lib.genres, lib.years, lib.rating_labels, lib.play_labels,
+    )))
+
+
+def build_compact_catalog(lib: Library, rows: list[int] | None = None) -> str:
+    if rows is None:
+        return "\n".join(f"{i}|{t}|{a}" for i, (t, a) in enumerate(zip(lib.titles, lib.artists)))
+    return "\n".join(f"{i}|{lib.titles[i]}|{lib.artists[i]}" for i in rows)
+
+
+def prefilter(lib: Library, prompt: str, k: int = MAX_TRACKS_COMPACT) -> list[int]:
+    """Pick the k rows that best match the prompt's words, filling any spare room with most-played tracks."""
+    tokens = [tok for tok in _PROMPT_WORD.findall(prompt.lower()) if len(tok) > 2]
+    blobs, plays = lib.search_blobs, lib.plays
+
+    # Match count ranks first so every matching track is kept when they fit in k;
+    # play count only breaks ties and picks the non-matching filler
+    def score(i: int) -> tuple[int, int]:
+        return sum(tok in blobs[i] for tok in tokens), int(plays[i] or 0)
+
+    return heapq.nlargest(k, range(len(lib)), key=score)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str | None) -> anthropic.Anthropic:
+    # Reuse one client (and its connection pool) per key across generations
+    return anthropic.Anthropic(api_key=api_key)
+
+
+def ask_claude_for_playlist(prompt: str, library: Library) -> tuple[str, list[int], str]:
+    client = _get_client(os.environ.get("ANTHROPIC_API_KEY"))
+    total  = len(library)
 
     if total <= MAX_TRACKS_FULL:
-        catalog      = build_full_catalog(tracks)
+        catalog      = build_full_catalog(library)
         catalog_desc = "id|title|artist|album|genre|year|rating|plays"
         print(f"   Sending full metadata for {total:,} tracks to Claude…", flush=True)
     elif total <= MAX_TRACKS_COMPACT:
-        catalog      = build_compact_catalog(tracks)
+        catalog      = build_compact_catalog(library)
         catalog_desc = "id|title|artist"
         print(f"   Sending compact catalog for {total:,} tracks to Claude…", flush=True)
     else:
-        print(f"   Sampling {MAX_TRACKS_COMPACT:,} tracks from your {total:,}-track library…", flush=True)
-        by_plays = sorted(tracks, key=lambda x: int(x["plays"] or 0), reverse=True)
-        top      = by_plays[:MAX_TRACKS_COMPACT // 2]
-        rest     = by_plays[MAX_TRACKS_COMPACT // 2:]
-        random.shuffle(rest)
-        tracks   = top + rest[:MAX_TRACKS_COMPACT - len(top)]
-        catalog      = build_compact_catalog(tracks)
+        print(f"   Shortlisting {MAX_TRACKS_COMPACT:,} tracks from your {total:,}-track library…", flush=True)
+        catalog      = build_compact_catalog(library, prefilter(library, prompt))
         catalog_desc = "id|title|artist"
 
     system = """You are an expert music curator with encyclopedic knowledge of genres, moods, eras, artists, and song characteristics.
@@ -134,35 +336,46 @@ Rules:
 - Prioritise variety, curation quality, and faithfulness to the request.
 - If the library doesn't have enough matching tracks, pick the closest alternatives and note it in the rationale."""
 
+    # The SDK only accepts str content, so the message is one joined string;
+    # building it in a bytes buffer would still need a full decode copy here.
     user_message = f"User request: {prompt}\n\nLibrary catalog ({catalog_desc}):\n{catalog}"
 
     print("🤖 Asking Claude to curate your playlist…", flush=True)
-    message = client.messages.create(
+    chunks, received = [], 0
+    with client.messages.stream(
         model=CLAUDE_MODEL,
         max_tokens=4096,
         system=system,
         messages=[{"role": "user", "content": user_message}]
-    )
+    ) as stream:
+        # Show progress as the response arrives so the terminal isn't silent while
+        # Claude works; the reply itself is raw JSON, summarised once it's parsed
+        for text in stream.text_stream:
+            chunks.append(text)
+            received += len(text)
+            print(f"\r   Receiving playlist… {received:,} characters", end="", flush=True)
+    print()
 
-    raw = message.content[0].text.strip()
-    raw = re.sub(r'^```[a-z]*\n?', '', raw)
-    raw = re.sub(r'\n?```$', '', raw)
+    raw = "".join(chunks).strip()
+    raw = _FENCE_OPEN.sub('', raw)
+    raw = _FENCE_CLOSE.sub('', raw)
 
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        match = re.search(r'\{.*\}', raw, re.DOTALL)
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        match = _JSON_OBJ.search(raw)
         if match:
-            data = json.loads(match.group())
+            data = orjson.loads(match.group())
         else:
             raise ValueError(f"Claude returned unexpected format:\n{raw}")
 
     return data.get("playlist_name", "AI Playlist"), data.get("ids", []), data.get("rationale", "")
 
 
-def create_swinsian_playlist(playlist_name: str, track_ids: list[int], all_tracks: list[dict]):
-    id_to_track = {t["id"]: t for t in all_tracks}
-    selected    = [id_to_track[i] for i in track_ids if i in id_to_track]
+async def create_swinsian_playlist(playlist_name: str, track_ids: list[int], library: Library):
+    # ids are dense row indices, so the lookup is plain list indexing
+    pids, n  = library.pids, len(library)
+    selected = [pids[i] for i in track_ids if isinstance(i, int) and 0 <= i < n]
     random.shuffle(selected)  # randomise order before adding to Swinsian
 
     if not selected:
@@ -173,7 +386,7 @@ def create_swinsian_playlist(playlist_name: str, track_ids: list[int], all_track
 
     # Create playlist via File menu (make new playlist not supported via AppleScript)
     safe_name = playlist_name.replace("\\", "\\\\").replace('"', '\\"')
-    run_applescript(f'''
+    await run_applescript_async(f'''
 tell application "Swinsian" to activate
 delay 0.5
 tell application "System Events"
@@ -185,32 +398,34 @@ tell application "System Events"
     end tell
 end tell''')
 
-    # Add tracks in small batches using Swinsian's native `add tracks {} to` command
-    BATCH   = 50
-    added   = 0
-    batches = math.ceil(len(selected) / BATCH)
-
-    for b in range(batches):
-        chunk = selected[b * BATCH:(b + 1) * BATCH]
-        inner = []
-        for t in chunk:
-            safe_title  = t["title"].replace("\\", "\\\\").replace('"', '\\"')
-            safe_artist = t["artist"].replace("\\", "\\\\").replace('"', '\\"')
-            inner.append(f'''
-        set found to (every track whose name is "{safe_title}" and artist is "{safe_artist}")
-        if (count of found) > 0 then add tracks {{item 1 of found}} to normal playlist "{safe_name}"''')
-
-        batch_script = 'tell application "Swinsian"\n' + "\n".join(inner) + '\nend tell'
-        run_applescript(batch_script)
+    # Add tracks in batches using Swinsian's native `add tracks {} to` command, matched
+    # by persistent ID so each batch is a single query rather than one `whose` per track.
+    # The script is compiled once and reused, taking the IDs as arguments.
+    BATCH       = 1000
+    added       = 0
+    batches     = math.ceil(len(selected) / BATCH)
+    chunks      = [selected[b * BATCH:(b + 1) * BATCH] for b in range(batches)]
+    script_path = await compile_add_script()
+
+    async def add_batch(chunk: list[str]):
+        nonlocal added
+        await run_osascript_async("osascript", script_path, playlist_name, *chunk)
         added += len(chunk)
-        print(f"   Added {min(added, len(selected))}/{len(selected)} tracks…", flush=True)
+        print(f"   Added {added}/{len(selected)} tracks…", flush=True)
+
+    # Batches go one after another so the playlist keeps the selection's order
+    for chunk in chunks:
+        await add_batch(chunk)
 
     return len(selected)
 
 
 def main():
-    if len(sys.argv) > 1:
-        prompt = " ".join(sys.argv[1:])
+    args    = sys.argv[1:]
+    refresh = "--refresh" in args
+    args    = [a for a in args if a != "--refresh"]
+    if args:
+        prompt = " ".join(args)
     else:
         print("🎧 Swinsian AI Playlist Agent")
         print("─" * 40)
@@ -227,19 +442,19 @@ def main():
         sys.exit(1)
 
     try:
-        tracks = get_library_tracks()
+        library = asyncio.run(get_library_tracks(refresh))
     except RuntimeError as e:
         print(f"❌ Could not read Swinsian library: {e}")
         sys.exit(1)
 
-    if not tracks:
+    if not library:
         print("❌ Your Swinsian library appears to be empty.")
         sys.exit(1)
 
-    print(f"   Found {len(tracks):,} tracks in your library.")
+    print(f"   Found {len(library):,} tracks in your library.")
 
     try:
-        playlist_name, track_ids, rationale = ask_claude_for_playlist(prompt, tracks)
+        playlist_name, track_ids, rationale = ask_claude_for_playlist(prompt, library)
     except Exception as e:
         print(f"❌ Claude API error: {e}")
         sys.exit(1)
@@ -252,7 +467,7 @@ def main():
     print()
 
     try:
-        count = create_swinsian_playlist(playlist_name, track_ids, tracks)
+        count = asyncio.run(create_swinsian_playlist(playlist_name, track_ids, library))
     except RuntimeError as e:
         print(f"❌ Error creating playlist in Swinsian: {e}")
         sys.exit(1)
@@ -4,15 +4,28 @@ Swinsian AI Playlist Agent — GUI
 Run with: python swinsian_ui.py
 """
 
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import heapq
+import contextlib
+import csv
+import io
 import subprocess
 import json
 import re
 import math
 import random
+import tempfile
 import threading
+import time
+from dataclasses import dataclass, field, fields
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 import anthropic
+import orjson
 import os
 import keyring  # optional — gracefully skipped if unavailable
 
@@ -22,6 +35,15 @@ MAX_TRACKS_COMPACT = 4000
 CLAUDE_MODEL       = "claude-haiku-4-5-20251001"
 KEYRING_SERVICE    = "SwinsianAgent"
 KEYRING_USER       = "anthropic_api_key"
+# Each tool keeps its own cache file, so a CACHE_VERSION or Library change in one
+# never makes the other treat the cache as invalid and rewrite it on every run
+CACHE_PATH         = os.path.expanduser("~/.cache/swinsian_agent/ui_library.json")
+CACHE_VERSION      = 3
+CACHE_MAX_AGE      = 24 * 60 * 60  # seconds before cached ratings/play counts are re-read
+SWINSIAN_CHECK_TTL = 8      # seconds a Swinsian running-check is reused
+STREAM_LOG_CHARS   = 80     # streamed response characters per activity log line
+LIBRARY_TTL        = 300    # seconds a library read is reused within a session
+LOG_FLUSH_MS       = 100    # how often queued log lines are written to the activity log
 
 # ── Colours ────────────────────────────────────────────────────────────────────
 BG          = "#1a1a1a"
@@ -40,26 +62,175 @@ FONT_MONO   = ("SF Mono", 11)
 FONT_TITLE  = ("SF Pro Display", 20, "bold")
 # ───────────────────────────────────────────────────────────────────────────────
 
+# Markdown fences and the JSON object in Claude's reply
+_FENCE_OPEN  = re.compile(r'^```[a-z]*\n?')
+_FENCE_CLOSE = re.compile(r'\n?```$')
+_JSON_OBJ    = re.compile(r'\{.*\}', re.DOTALL)
+_PROMPT_WORD = re.compile(r'\w+')
+
+
+@dataclass
+class Library:
+    """Track metadata stored column-wise; a track's id is its row index."""
+    titles:  list[str] = field(default_factory=list)
+    artists: list[str] = field(default_factory=list)
+    albums:  list[str] = field(default_factory=list)
+    genres:  list[str] = field(default_factory=list)
+    years:   list[str] = field(default_factory=list)
+    ratings: list[str] = field(default_factory=list)
+    plays:   list[str] = field(default_factory=list)
+    pids:    list[str] = field(default_factory=list)
+    # "★3" / "▶12" catalog labels, built once per library rather than per catalog line
+    rating_labels: list[str] = field(init=False, repr=False)
+    play_labels:   list[str] = field(init=False, repr=False)
+    # lowercased "title artist album genre" text matched by prefilter()
+    search_blobs:  list[str] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.rating_labels = ["★" + r for r in self.ratings]
+        self.play_labels   = ["▶" + p for p in self.plays]
+        self.search_blobs  = [
+            f"{t} {a} {al} {g}".lower()
+            for t, a, al, g in zip(self.titles, self.artists, self.albums, self.genres)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+
+async def run_osascript_async(*args: str, script: str | None = None, strip: bool = True) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate(script.encode() if script is not None else None)
+    if proc.returncode != 0:
+        raise RuntimeError(stderr.decode().strip())
+    out = stdout.decode()
+    return out.strip() if strip else out
+
+
+async def run_applescript_async(script: str, strip: bool = True) -> str:
+    # The script goes in on stdin rather than as an -e argument, so its size isn't capped by ARG_MAX
+    return await run_osascript_async("osascript", "-", script=script, strip=strip)
+
+
+# Takes the playlist name followed by persistent IDs as arguments. The `whose`
+# query returns tracks in library order, so they are put back into argument
+# order before adding. Script properties make the list lookups fast.
+ADD_TRACKS_SCRIPT = '''property found : {}
+property foundIds : {}
+
+on run argv
+    set wanted to items 2 thru -1 of argv
+    tell application "Swinsian"
+        set my found to every track whose persistent ID is in wanted
+        set my foundIds to persistent ID of every track whose persistent ID is in wanted
+    end tell
+    set ordered to {}
+    repeat with wantedRef in wanted
+        set pid to contents of wantedRef
+        repeat with k from 1 to count of my foundIds
+            if item k of my foundIds is pid then
+                set end of ordered to item k of my found
+                exit repeat
+            end if
+        end repeat
+    end repeat
+    set my found to {}
+    set my foundIds to {}
+    tell application "Swinsian" to add tracks ordered to normal playlist (item 1 of argv)
+end run'''
+
+
+async def compile_add_script() -> str:
+    """Compile ADD_TRACKS_SCRIPT once (per script version) and return the .scpt path."""
+    digest = hashlib.sha1(ADD_TRACKS_SCRIPT.encode()).hexdigest()[:8]
+    path   = os.path.join(tempfile.gettempdir(), f"swinsian_add_{digest}.scpt")
+    if not os.path.exists(path):
+        # Compile beside the final path and swap it in, so a failed or killed
+        # osacompile never leaves a truncated .scpt that later runs would reuse
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".scpt")
+        os.close(fd)
+        try:
+            await run_osascript_async("osacompile", "-o", tmp_path, "-e", ADD_TRACKS_SCRIPT)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+    return path
+
 
-def run_applescript(script: str) -> str:
-    result = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr.strip())
-    return result.stdout.strip()
+_last_swinsian_check = (float("-inf"), False)  # (monotonic timestamp, running)
 
 
 def is_swinsian_running() -> bool:
+    global _last_swinsian_check
+    checked_at, running = _last_swinsian_check
+    now = time.monotonic()
+    if now - checked_at < SWINSIAN_CHECK_TTL:
+        return running
+    # pgrep is a plain fork/exec, far cheaper than asking System Events via osascript
     try:
-        out = run_applescript(
-            'tell application "System Events" to return (name of processes) contains "Swinsian"'
-        )
-        return out.strip().lower() == "true"
+        running = subprocess.run(["pgrep", "-x", "Swinsian"], capture_output=True).returncode == 0
     except Exception:
-        return False
+        running = False
+    _last_swinsian_check = (now, running)
+    return running
+
 
+def load_cached_tracks(probe: str) -> Library | None:
+    """Return the cached library if it matches the library probe and hasn't expired."""
+    try:
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("version") != CACHE_VERSION or cached.get("probe") != probe:
+        return None
+    if time.time() - cached.get("saved_at", 0) > CACHE_MAX_AGE:
+        return None
+    return Library(**cached["library"])
+
+
+def save_cached_tracks(library: Library, probe: str):
+    """Write the library cache atomically so a crash never leaves a torn file."""
+    cache_dir = os.path.dirname(CACHE_PATH)
+    columns   = {f.name: getattr(library, f.name) for f in fields(Library) if f.init}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError:
+        return  # the cache is only an optimisation
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "probe": probe, "saved_at": time.time(), "library": columns}, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        # Don't leave a partial .tmp behind for every failed write (e.g. a full disk)
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
 
-def get_library_tracks(log) -> list[dict]:
-    def fetch_property(prop: str) -> list[str]:
+
+def clear_cached_tracks():
+    try:
+        os.remove(CACHE_PATH)
+    except OSError:
+        pass
+
+
+async def get_library_tracks(log, refresh: bool = False) -> Library:
+    props = [
+        ("names", "name"), ("artists", "artist"), ("albums", "album"),
+        ("genres", "genre"), ("years", "year"), ("ratings", "rating"),
+        ("play counts", "play count"), ("persistent IDs", "persistent ID"),
+    ]
+
+    def split_column(raw: str) -> list[str]:
+        return [s.strip() for s in raw.split("~~~")] if raw else []
+
+    async def fetch_property(label: str, prop: str) -> list[str]:
         script = f'''
 tell application "Swinsian"
     set vals to {prop} of every track
@@ -69,71 +240,122 @@ tell application "Swinsian"
     return output
 end tell
 '''
-        raw = run_applescript(script)
-        return raw.split("~~~") if raw else []
+        raw = await run_applescript_async(script)
+        log(f"   Fetched {label}…")
+        return split_column(raw)
+
+    async def fetch_all_properties(track_count: int) -> tuple[list[str], ...]:
+        # One Apple-event round-trip for every column: each property list is
+        # joined with tabs, one column per line, so csv.reader splits it all in C.
+        fetches = "\n".join(f"    set col{i} to {prop} of every track" for i, (_, prop) in enumerate(props))
+        joined  = " & linefeed & ".join(f"(col{i} as string)" for i in range(len(props)))
+        script = f'''
+tell application "Swinsian"
+{fetches}
+end tell
+set AppleScript's text item delimiters to tab
+set output to {joined}
+set AppleScript's text item delimiters to ""
+return output
+'''
+        # Not stripped: a leading tab is an empty first name, not whitespace
+        raw     = await run_applescript_async(script, strip=False)
+        try:
+            columns = list(csv.reader(io.StringIO(raw), delimiter="\t", quoting=csv.QUOTE_NONE))
+        except csv.Error as e:
+            raise RuntimeError(f"unreadable track metadata: {e}") from e
+        if track_count == 1:
+            # a one-track column with an empty value comes back as a blank line
+            columns = [col or [""] for col in columns]
+        # Tabs or line breaks inside a value shift the columns out of line
+        if len(columns) != len(props) or any(len(col) != track_count for col in columns):
+            raise RuntimeError("track metadata contains tabs or line breaks")
+        return tuple([s.strip() for s in col] for col in columns)
+
+    # The track count and the newest track's persistent ID are two cheap Apple
+    # events; if neither has changed since the last run (and the cache hasn't
+    # expired), reuse the cached metadata instead of a full fetch.
+    probe = await run_applescript_async('''
+tell application "Swinsian"
+    set n to count of every track
+    if n is 0 then return "0"
+    return (n as string) & tab & (persistent ID of last track)
+end tell''')
+    track_count = int(probe.split("\t")[0] or 0)
+    cached = None if refresh else load_cached_tracks(probe)
+    if cached is not None:
+        log("   Library unchanged, using cached metadata…")
+        return cached
+
+    log("   Fetching track metadata…")
+    try:
+        names, artists, albums, genres, years, ratings, plays, pids = await fetch_all_properties(track_count)
+    except RuntimeError as e:
+        log(f"   Bulk fetch failed ({e}), fetching properties separately…")
+        # The per-property scripts run concurrently, so the wall time is the
+        # slowest fetch rather than the sum of them all.
+        names, artists, albums, genres, years, ratings, plays, pids = await asyncio.gather(
+            *(fetch_property(label, prop) for label, prop in props)
+        )
+
+    # Pad short columns once up front so building rows needs no bounds checks
+    columns = [names, artists, albums, genres, years, ratings, plays, pids]
+    for values in columns[1:]:
+        values += [""] * (len(names) - len(values))
+
+    # Tracks without a name are dropped, so ids are dense row indices
+    rows    = [i for i, name in enumerate(names) if name]
+    library = Library(*([values[i] for i in rows] for values in columns))
+    save_cached_tracks(library, probe)
+    return library
+
+
+def build_full_catalog(lib):
+    # "|".join over zipped columns keeps the per-row formatting in C
+    return "\n".join(map("|".join, zip(
+        map(str, range(len(lib))), lib.titles, lib.artists, lib.albums,
+        lib.genres, lib.years, lib.rating_labels, lib.play_labels,
+    )))
+
+
+def build_compact_catalog(lib, rows=None):
+    if rows is None:
+        return "\n".join(f"{i}|{t}|{a}" for i, (t, a) in enumerate(zip(lib.titles, lib.artists)))
+    return "\n".join(f"{i}|{lib.titles[i]}|{lib.artists[i]}" for i in rows)
 
-    for label, prop in [
-        ("names", "name"), ("artists", "artist"), ("albums", "album"),
-        ("genres", "genre"), ("years", "year"), ("ratings", "rating"),
-        ("play counts", "play count"),
-    ]:
-        log(f"   Fetching {label}…")
-
-    names   = fetch_property("name")
-    artists = fetch_property("artist")
-    albums  = fetch_property("album")
-    genres  = fetch_property("genre")
-    years   = fetch_property("year")
-    ratings = fetch_property("rating")
-    plays   = fetch_property("play count")
-
-    tracks = []
-    for i, name in enumerate(names):
-        name = name.strip()
-        if not name:
-            continue
-        tracks.append({
-            "id":     i,
-            "title":  name,
-            "artist": artists[i].strip() if i < len(artists) else "",
-            "album":  albums[i].strip()  if i < len(albums)  else "",
-            "genre":  genres[i].strip()  if i < len(genres)  else "",
-            "year":   years[i].strip()   if i < len(years)   else "",
-            "rating": ratings[i].strip() if i < len(ratings) else "",
-            "plays":  plays[i].strip()   if i < len(plays)   else "",
-        })
-    return tracks
-
-
-def build_full_catalog(tracks):
-    return "\n".join(
-        f'{t["id"]}|{t["title"]}|{t["artist"]}|{t["album"]}|{t["genre"]}|{t["year"]}|★{t["rating"]}|▶{t["plays"]}'
-        for t in tracks
-    )
 
+def prefilter(lib: Library, prompt: str, k: int = MAX_TRACKS_COMPACT) -> list[int]:
+    """Pick the k rows that best match the prompt's words, filling any spare room with most-played tracks."""
+    tokens = [tok for tok in _PROMPT_WORD.findall(prompt.lower()) if len(tok) > 2]
+    blobs, plays = lib.search_blobs, lib.plays
 
-def build_compact_catalog(tracks):
-    return "\n".join(f'{t["id"]}|{t["title"]}|{t["artist"]}' for t in tracks)
+    # Match count ranks first so every matching track is kept when they fit in k;
+    # play count only breaks ties and picks the non-matching filler
+    def score(i: int) -> tuple[int, int]:
+        return sum(tok in blobs[i] for tok in tokens), int(plays[i] or 0)
 
+    return heapq.nlargest(k, range(len(lib)), key=score)
 
-def ask_claude(api_key: str, prompt: str, num_songs: int, tracks: list[dict], log) -> tuple:
-    client = anthropic.Anthropic(api_key=api_key)
-    total  = len(tracks)
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str | None) -> anthropic.AsyncAnthropic:
+    # Reuse one client (and its connection pool) per key across generations
+    return anthropic.AsyncAnthropic(api_key=api_key)
+
+
+async def ask_claude(api_key: str, prompt: str, num_songs: int, library: Library, log) -> tuple:
+    client = _get_client(api_key)
+    total  = len(library)
 
     if total <= MAX_TRACKS_FULL:
-        catalog, desc = build_full_catalog(tracks), "id|title|artist|album|genre|year|rating|plays"
+        catalog, desc = build_full_catalog(library), "id|title|artist|album|genre|year|rating|plays"
         log(f"   Sending full metadata for {total:,} tracks…")
     elif total <= MAX_TRACKS_COMPACT:
-        catalog, desc = build_compact_catalog(tracks), "id|title|artist"
+        catalog, desc = build_compact_catalog(library), "id|title|artist"
         log(f"   Sending compact catalog for {total:,} tracks…")
     else:
-        log(f"   Sampling {MAX_TRACKS_COMPACT:,} from {total:,} tracks…")
-        by_plays = sorted(tracks, key=lambda x: int(x["plays"] or 0), reverse=True)
-        top  = by_plays[:MAX_TRACKS_COMPACT // 2]
-        rest = by_plays[MAX_TRACKS_COMPACT // 2:]
-        random.shuffle(rest)
-        tracks  = top + rest[:MAX_TRACKS_COMPACT - len(top)]
-        catalog, desc = build_compact_catalog(tracks), "id|title|artist"
+        log(f"   Shortlisting {MAX_TRACKS_COMPACT:,} from {total:,} tracks…")
+        catalog, desc = build_compact_catalog(library, prefilter(library, prompt)), "id|title|artist"
 
     system = f"""You are an expert music curator with encyclopedic knowledge of genres, moods, eras, artists, and song characteristics.
 You will receive a user's music library and a playlist request.
@@ -147,35 +369,48 @@ Rules:
 - Prioritise variety, curation quality, and faithfulness to the request.
 - If the library doesn't have enough matching tracks, pick the closest alternatives and note it in the rationale."""
 
+    # The SDK only accepts str content, so the message is one joined string;
+    # building it in a bytes buffer would still need a full decode copy here.
     user_message = f"User request: {prompt}\n\nLibrary catalog ({desc}):\n{catalog}"
 
     log("   Asking Claude to curate your playlist…")
-    message = client.messages.create(
+    chunks, pending = [], ""
+    async with client.messages.stream(
         model=CLAUDE_MODEL,
         max_tokens=4096,
         system=system,
         messages=[{"role": "user", "content": user_message}]
-    )
-
-    raw = message.content[0].text.strip()
-    raw = re.sub(r'^```[a-z]*\n?', '', raw)
-    raw = re.sub(r'\n?```$', '', raw)
+    ) as stream:
+        # Show the response in the activity log as it arrives
+        async for text in stream.text_stream:
+            chunks.append(text)
+            pending += text
+            if len(pending) >= STREAM_LOG_CHARS:
+                log(pending, "dim")
+                pending = ""
+    if pending:
+        log(pending, "dim")
+
+    raw = "".join(chunks).strip()
+    raw = _FENCE_OPEN.sub('', raw)
+    raw = _FENCE_CLOSE.sub('', raw)
 
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        match = re.search(r'\{.*\}', raw, re.DOTALL)
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        match = _JSON_OBJ.search(raw)
         if match:
-            data = json.loads(match.group())
+            data = orjson.loads(match.group())
         else:
             raise ValueError(f"Unexpected Claude response: {raw}")
 
     return data.get("playlist_name", "AI Playlist"), data.get("ids", []), data.get("rationale", "")
 
 
-def create_playlist(playlist_name: str, track_ids: list, all_tracks: list, randomise: bool, log) -> int:
-    id_to_track = {t["id"]: t for t in all_tracks}
-    selected    = [id_to_track[i] for i in track_ids if i in id_to_track]
+async def create_playlist(playlist_name: str, track_ids: list, library: Library, randomise: bool, log) -> int:
+    # ids are dense row indices, so the lookup is plain list indexing
+    pids, n  = library.pids, len(library)
+    selected = [pids[i] for i in track_ids if isinstance(i, int) and 0 <= i < n]
 
     if randomise:
         random.shuffle(selected)
@@ -187,7 +422,7 @@ def create_playlist(playlist_name: str, track_ids: list, all_tracks: list, rando
     log(f"   Creating playlist '{playlist_name}' with {len(selected)} tracks…")
 
     safe_name = playlist_name.replace("\\", "\\\\").replace('"', '\\"')
-    run_applescript(f'''
+    await run_applescript_async(f'''
 tell application "Swinsian" to activate
 delay 0.5
 tell application "System Events"
@@ -199,22 +434,21 @@ tell application "System Events"
     end tell
 end tell''')
 
-    BATCH   = 50
-    added   = 0
-    batches = math.ceil(len(selected) / BATCH)
-
-    for b in range(batches):
-        chunk = selected[b * BATCH:(b + 1) * BATCH]
-        inner = []
-        for t in chunk:
-            st = t["title"].replace("\\", "\\\\").replace('"', '\\"')
-            sa = t["artist"].replace("\\", "\\\\").replace('"', '\\"')
-            inner.append(f'''
-        set found to (every track whose name is "{st}" and artist is "{sa}")
-        if (count of found) > 0 then add tracks {{item 1 of found}} to normal playlist "{safe_name}"''')
-        run_applescript('tell application "Swinsian"\n' + "\n".join(inner) + '\nend tell')
+    BATCH       = 1000
+    added       = 0
+    batches     = math.ceil(len(selected) / BATCH)
+    chunks      = [selected[b * BATCH:(b + 1) * BATCH] for b in range(batches)]
+    script_path = await compile_add_script()
+
+    async def add_batch(chunk: list):
+        nonlocal added
+        await run_osascript_async("osascript", script_path, playlist_name, *chunk)
         added += len(chunk)
-        log(f"   Added {min(added, len(selected))}/{len(selected)} tracks…")
+        log(f"   Added {added}/{len(selected)} tracks…")
+
+    # Batches go one after another so the playlist keeps the selection's order
+    for chunk in chunks:
+        await add_batch(chunk)
 
     return len(selected)
 
@@ -227,10 +461,23 @@ class App(tk.Tk):
         self.title("Swinsian AI Playlist Agent")
         self.configure(bg=BG)
         self.resizable(False, False)
+        # Log lines from any thread are queued and written in one batch per flush
+        self._log_queue = collections.deque()
         self._setup_styles()
         self._build_ui()
         self._load_api_key()
         self.after(100, self._check_swinsian)
+        self.after(LOG_FLUSH_MS, self._flush_log)
+
+        # Claude requests run on a long-lived event loop so they can be cancelled
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._current_task = None
+        self._cancel_requested = False
+
+        # Library read by the last run, reused until LIBRARY_TTL passes or Refresh is clicked
+        self._cached_tracks = None
+        self._tracks_fetched_at = 0
 
     # ── styles ───────────────────────────────────────────────────────────────
 
@@ -314,6 +561,9 @@ class App(tk.Tk):
                             cursor="hand2")
         cb.pack(anchor="w", pady=(4, 0))
 
+        self._button(opts_row, "Refresh Library", self._refresh_library,
+                     small=True).pack(side="right", anchor="s")
+
         # ── generate button
         self.gen_btn = ttk.Button(
             root, text="✦  Generate Playlist",
@@ -381,19 +631,26 @@ class App(tk.Tk):
         )
 
     def _log(self, msg: str, tag: str = ""):
-        def _write():
+        self._log_queue.append((msg, tag))
+
+    def _flush_log(self):
+        chunks = []
+        while self._log_queue:
+            msg, tag = self._log_queue.popleft()
+            chunks += [msg + "\n", tag]
+        if chunks:
             self.log_box.config(state="normal")
-            self.log_box.insert("end", msg + "\n", tag)
+            self.log_box.insert("end", *chunks)
             self.log_box.see("end")
             self.log_box.config(state="disabled")
-        self.after(0, _write)
+        self.after(LOG_FLUSH_MS, self._flush_log)
 
     def _set_running(self, running: bool):
         def _update():
             if running:
-                self.gen_btn.config(text="⏳  Generating…", state="disabled")
+                self.gen_btn.config(text="■  Cancel", state="normal", command=self._cancel)
             else:
-                self.gen_btn.config(text="✦  Generate Playlist", state="normal")
+                self.gen_btn.config(text="✦  Generate Playlist", state="normal", command=self._run)
         self.after(0, _update)
 
     # ── API key persistence ───────────────────────────────────────────────────
@@ -441,6 +698,25 @@ class App(tk.Tk):
             self.status_label.config(text="Swinsian not detected", fg=RED)
         self.after(5000, self._check_swinsian)
 
+    # ── library ───────────────────────────────────────────────────────────────
+
+    def _get_tracks(self) -> Library:
+        if (self._cached_tracks is not None
+                and time.monotonic() - self._tracks_fetched_at < LIBRARY_TTL):
+            self._log("   Using the library read earlier this session…", "dim")
+            return self._cached_tracks
+        # Once this session's copy has expired, go back to Swinsian rather than
+        # the disk cache, which would hand back the same stale metadata
+        expired = self._cached_tracks is not None
+        library = asyncio.run(get_library_tracks(self._log, refresh=expired))
+        self._cached_tracks, self._tracks_fetched_at = library, time.monotonic()
+        return library
+
+    def _refresh_library(self):
+        self._cached_tracks = None
+        clear_cached_tracks()
+        self._log("↻ Library will be re-read from Swinsian on the next run.", "dim")
+
     # ── main run ──────────────────────────────────────────────────────────────
 
     def _run(self):
@@ -463,9 +739,11 @@ class App(tk.Tk):
             self._log("❌ Swinsian isn't running. Please open it and try again.", "err"); return
 
         # Clear log and run in background thread
+        self._log_queue.clear()
         self.log_box.config(state="normal")
         self.log_box.delete("1.0", "end")
         self.log_box.config(state="disabled")
+        self._cancel_requested = False
         self._set_running(True)
         threading.Thread(target=self._worker,
                          args=(api_key, prompt, num_songs, randomise),
@@ -478,26 +756,45 @@ class App(tk.Tk):
             self._log("")
 
             self._log("📚 Reading your Swinsian library…")
-            tracks = get_library_tracks(self._log)
-            self._log(f"   Found {len(tracks):,} tracks.", "dim")
+            library = self._get_tracks()
+            self._log(f"   Found {len(library):,} tracks.", "dim")
             self._log("")
 
+            if self._cancel_requested:
+                raise concurrent.futures.CancelledError()
             self._log("🤖 Asking Claude to curate…")
-            name, ids, rationale = ask_claude(api_key, prompt, num_songs, tracks, self._log)
+            self._current_task = asyncio.run_coroutine_threadsafe(
+                ask_claude(api_key, prompt, num_songs, library, self._log), self._loop
+            )
+            name, ids, rationale = self._current_task.result()
             self._log(f'   Playlist name: "{name}"', "dim")
             self._log(f"   Rationale: {rationale}", "dim")
             self._log("")
 
+            if self._cancel_requested:
+                raise concurrent.futures.CancelledError()
+
             self._log("🎵 Building playlist in Swinsian…")
-            count = create_playlist(name, ids, tracks, randomise, self._log)
+            count = asyncio.run(create_playlist(name, ids, library, randomise, self._log))
             self._log("")
             self._log(f'✅ Done! "{name}" created with {count} tracks. Enjoy! 🎶', "ok")
 
+        except concurrent.futures.CancelledError:
+            self._log("⏹  Cancelled.", "dim")
         except Exception as e:
             self._log(f"❌ Error: {e}", "err")
         finally:
+            self._current_task = None
             self._set_running(False)
 
+    def _cancel(self):
+        # Stops the Claude request if one is in flight; otherwise the worker
+        # stops at the next step. Playlist creation is never interrupted.
+        self._cancel_requested = True
+        if self._current_task is not None:
+            self._current_task.cancel()
+        self.gen_btn.config(text="⏳  Cancelling…", state="disabled")
+
 
 if __name__ == "__main__":
     app = App()